@@ -1,13 +1,12 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import numpy as np
 from datetime import datetime, date
 import sqlite3
-from weather_metrics import WeatherMetrics
-from weather_sql import WeatherData, DatabaseHandler
-from utils import get_coordinates_from_location, validate_date, format_weather_data
+import threading
+from weather_metrics import WeatherMetrics, WeatherResult, analysis_years
+from weather_sql import DatabaseHandler
+from utils import get_coordinates_from_location, validate_date, format_weather_data, compact_raw_data, pack_raw_data, unpack_raw_data
 
 # Set page configuration
 st.set_page_config(
@@ -22,8 +21,8 @@ if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
 if 'weather_data' not in st.session_state:
     st.session_state.weather_data = None
-if 'metrics' not in st.session_state:
-    st.session_state.metrics = None
+if 'raw_data' not in st.session_state:
+    st.session_state.raw_data = None
 
 def main():
     st.title("⛅ Weather Prediction System")
@@ -111,7 +110,7 @@ def main():
         if st.button("View Stored Data", use_container_width=True):
             show_database_records()
 
-    # Main content area
+    # Main content area, an analysis run from the sidebar above is shown in this same run
     if st.session_state.analysis_complete and st.session_state.weather_data is not None:
         display_analysis_results()
     else:
@@ -141,9 +140,72 @@ def main():
             - Weather risk assessment
             """)
 
+@st.cache_resource
+def _db_conn():
+    """Shared SQLite connection reused across reruns, returns (connection, lock)"""
+    conn = sqlite3.connect('weather.db', check_same_thread=False)
+    # WAL lets these reads run while an analysis is being inserted
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-8000")
+    return conn, threading.Lock()
+
+def load_cached_analysis(latitude, longitude, month, day, year):
+    """Look up a previously stored analysis, returns (WeatherResult, raw_data) or None"""
+    query = """
+    SELECT d.latitude, d.longitude, d.month, d.day, d.year,
+           d.avg_temp, d.min_temp, d.max_temp, d.avg_wind, d.min_wind, d.max_wind,
+           d.sum_precip, d.min_precip, d.max_precip, r.arrays
+    FROM weather_data d
+    JOIN weather_raw r
+      ON r.latitude = d.latitude AND r.longitude = d.longitude
+     AND r.month = d.month AND r.day = d.day AND r.year = d.year
+    WHERE d.latitude = ? AND d.longitude = ? AND d.month = ? AND d.day = ? AND d.year = ?
+    LIMIT 1
+    """
+    try:
+        conn, lock = _db_conn()
+        with lock:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            row = cursor.execute(query, (latitude, longitude, month, day, year)).fetchone()
+    except sqlite3.Error:
+        # If the cache can't be read, fall back to a fresh analysis
+        return None
+    
+    if row is None:
+        return None
+    
+    raw_data = unpack_raw_data(row['arrays'])
+    # Stored stats cover the 5 years before the year they were computed,
+    # so once the window moves on (or years are missing) run a fresh analysis instead
+    if tuple(raw_data['year'].tolist()) != analysis_years(month, day):
+        return None
+    
+    # SQLite stores an all-NaN statistic as NULL, turn it back into NaN so formatting never sees None
+    result = WeatherResult(**{key: float('nan') if row[key] is None else row[key]
+                              for key in row.keys() if key != 'arrays'})
+    return result, raw_data
+
 def run_weather_analysis(latitude, longitude, target_date):
     """Run the weather analysis for the given parameters"""
     try:
+        # Coordinates are rounded so repeat queries for the same spot match the stored analysis
+        latitude = round(latitude, 4)
+        longitude = round(longitude, 4)
+        
+        cached = load_cached_analysis(latitude, longitude, target_date.month, target_date.day, target_date.year)
+        if cached is not None:
+            result, raw_data = cached
+            
+            # Store in session state
+            st.session_state.raw_data = raw_data
+            st.session_state.weather_data = result
+            st.session_state.analysis_complete = True
+            
+            st.success("✅ Analysis complete! (loaded from previous analysis)")
+            return
+        
         with st.spinner("🌐 Fetching weather data... This may take a moment."):
             # Create WeatherMetrics instance
             metrics = WeatherMetrics(
@@ -154,52 +216,19 @@ def run_weather_analysis(latitude, longitude, target_date):
                 year=target_date.year
             )
             
-            # Store in database
-            weather_data = WeatherData(
-                longitude=metrics.longitude,
-                latitude=metrics.latitude,
-                month=metrics.month,
-                day=metrics.day,
-                year=metrics.year,
-                avg_temp=metrics.avg_temp,
-                min_temp=metrics.min_temp,
-                max_temp=metrics.max_temp,
-                avg_wind=metrics.avg_wind,
-                min_wind=metrics.min_wind,
-                max_wind=metrics.max_wind,
-                sum_precip=metrics.sum_precip,
-                min_precip=metrics.min_precip,
-                max_precip=metrics.max_precip
-            )
+            # Keep only the small arrays the charts need, not the WeatherMetrics object
+            raw_data = compact_raw_data(metrics.raw_data)
             
+            # Store the stats and the raw arrays together so the charts can be redrawn without the API
             db_handler = DatabaseHandler()
-            db_handler.insert_data(weather_data)
-            
-            # Store the data as a dictionary instead of SQLAlchemy object
-            weather_dict = {
-                'latitude': metrics.latitude,
-                'longitude': metrics.longitude,
-                'month': metrics.month,
-                'day': metrics.day,
-                'year': metrics.year,
-                'avg_temp': metrics.avg_temp,
-                'min_temp': metrics.min_temp,
-                'max_temp': metrics.max_temp,
-                'avg_wind': metrics.avg_wind,
-                'min_wind': metrics.min_wind,
-                'max_wind': metrics.max_wind,
-                'sum_precip': metrics.sum_precip,
-                'min_precip': metrics.min_precip,
-                'max_precip': metrics.max_precip
-            }
+            db_handler.save_analysis(metrics.result, pack_raw_data(raw_data))
             
             # Store in session state
-            st.session_state.metrics = metrics
-            st.session_state.weather_data = weather_dict
+            st.session_state.raw_data = raw_data
+            st.session_state.weather_data = metrics.result
             st.session_state.analysis_complete = True
             
             st.success("✅ Analysis complete!")
-            st.rerun()
             
     except Exception as e:
         st.error(f"❌ An error occurred during analysis: {str(e)}")
@@ -207,7 +236,7 @@ def run_weather_analysis(latitude, longitude, target_date):
 
 def display_analysis_results():
     """Display the weather analysis results with visualizations"""
-    metrics = st.session_state.metrics
+    raw_data = st.session_state.raw_data
     weather_data = st.session_state.weather_data
     
     # Header with location info
@@ -215,11 +244,11 @@ def display_analysis_results():
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("📍 Latitude", f"{weather_data['latitude']:.4f}°")
+        st.metric("📍 Latitude", f"{weather_data.latitude:.4f}°")
     with col2:
-        st.metric("📍 Longitude", f"{weather_data['longitude']:.4f}°")
+        st.metric("📍 Longitude", f"{weather_data.longitude:.4f}°")
     with col3:
-        st.metric("📅 Target Date", f"{weather_data['month']}/{weather_data['day']}/{weather_data['year']}")
+        st.metric("📅 Target Date", f"{weather_data.month}/{weather_data.day}/{weather_data.year}")
     
     st.markdown("---")
     
@@ -231,22 +260,22 @@ def display_analysis_results():
     with col1:
         st.metric(
             "🌡️ Avg Temperature",
-            f"{weather_data['avg_temp']:.1f}°F",
-            delta=f"Range: {weather_data['min_temp']:.1f}°F - {weather_data['max_temp']:.1f}°F"
+            f"{weather_data.avg_temp:.1f}°F",
+            delta=f"Range: {weather_data.min_temp:.1f}°F - {weather_data.max_temp:.1f}°F"
         )
     
     with col2:
         st.metric(
             "💨 Avg Wind Speed",
-            f"{weather_data['avg_wind']:.1f} mph",
-            delta=f"Max: {weather_data['max_wind']:.1f} mph"
+            f"{weather_data.avg_wind:.1f} mph",
+            delta=f"Max: {weather_data.max_wind:.1f} mph"
         )
     
     with col3:
         st.metric(
             "🌧️ Total Precipitation",
-            f"{weather_data['sum_precip']:.2f} in",
-            delta=f"Max daily: {weather_data['max_precip']:.2f} in"
+            f"{weather_data.sum_precip:.2f} in",
+            delta=f"Max daily: {weather_data.max_precip:.2f} in"
         )
     
     with col4:
@@ -257,7 +286,7 @@ def display_analysis_results():
     st.markdown("---")
     
     # Detailed visualizations
-    create_weather_visualizations(metrics)
+    create_weather_visualizations(raw_data)
     
     # Detailed statistics table
     st.subheader("📈 Detailed Statistics")
@@ -270,18 +299,11 @@ def display_analysis_results():
     col1, col2 = st.columns(2)
     with col1:
         if st.button("📊 Download Data as CSV"):
-            # Create a simple WeatherData-like object for the format function
-            class SimpleWeatherData:
-                def __init__(self, data_dict):
-                    for key, value in data_dict.items():
-                        setattr(self, key, value)
-            
-            weather_obj = SimpleWeatherData(weather_data)
-            csv_data = format_weather_data(weather_obj)
+            csv_data = format_weather_data(weather_data)
             st.download_button(
                 label="Download CSV",
                 data=csv_data,
-                file_name=f"weather_analysis_{weather_data['latitude']}_{weather_data['longitude']}_{weather_data['month']}-{weather_data['day']}-{weather_data['year']}.csv",
+                file_name=f"weather_analysis_{weather_data.latitude}_{weather_data.longitude}_{weather_data.month}-{weather_data.day}-{weather_data.year}.csv",
                 mime="text/csv"
             )
     
@@ -289,14 +311,31 @@ def display_analysis_results():
         if st.button("🔄 Start New Analysis"):
             st.session_state.analysis_complete = False
             st.session_state.weather_data = None
-            st.session_state.metrics = None
-            st.rerun()
+            st.session_state.raw_data = None
+
+# Layout settings shared by every chart
+BASE_LAYOUT = dict(
+    xaxis_title='Year',
+    hovermode='x unified',
+    height=400,
+    margin=dict(l=40, r=10, t=40, b=30)
+)
 
-def create_weather_visualizations(metrics):
+def create_weather_visualizations(raw_data):
     """Create interactive visualizations of the weather data"""
+    # Imported here so the welcome screen doesn't pay for loading Plotly
+    import plotly.graph_objects as go
     
-    # Get the raw data for visualizations
-    raw_data = metrics.get_data_for_date()
+    # Shared x-axis and bar labels, computed once for all tabs
+    # Narrow dtypes keep the chart payload sent to the browser small
+    years = np.asarray(raw_data['year'], dtype=np.int16)
+    temp_max = np.asarray(raw_data['temperature_2m_max'], dtype=np.float32)
+    temp_min = np.asarray(raw_data['temperature_2m_min'], dtype=np.float32)
+    temp_mean = np.asarray(raw_data['temperature_2m_mean'], dtype=np.float32)
+    wind_max = np.asarray(raw_data['wind_speed_10m_max'], dtype=np.float32)
+    gusts_max = np.asarray(raw_data['wind_gusts_10m_max'], dtype=np.float32)
+    precip = np.asarray(raw_data['precipitation_sum'], dtype=np.float32)
+    precip_text = np.char.add(np.char.mod('%.2f', precip), ' in')
     
     # Create tabs for different visualizations
     tab1, tab2, tab3 = st.tabs(["🌡️ Temperature", "💨 Wind Speed", "🌧️ Precipitation"])
@@ -305,41 +344,37 @@ def create_weather_visualizations(metrics):
         # Temperature visualization
         fig_temp = go.Figure()
         
-        years = [date.year for date in raw_data['date']]
-        
-        fig_temp.add_trace(go.Scatter(
-            x=years,
-            y=raw_data['temperature_2m_max'],
-            mode='lines+markers',
-            name='Max Temperature',
-            line=dict(color='red', width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig_temp.add_trace(go.Scatter(
-            x=years,
-            y=raw_data['temperature_2m_min'],
-            mode='lines+markers',
-            name='Min Temperature',
-            line=dict(color='blue', width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig_temp.add_trace(go.Scatter(
-            x=years,
-            y=raw_data['temperature_2m_mean'],
-            mode='lines+markers',
-            name='Mean Temperature',
-            line=dict(color='orange', width=3),
-            marker=dict(size=8)
-        ))
+        fig_temp.add_traces([
+            go.Scatter(
+                x=years,
+                y=temp_max,
+                mode='lines+markers',
+                name='Max Temperature',
+                line=dict(color='red', width=3),
+                marker=dict(size=8)
+            ),
+            go.Scatter(
+                x=years,
+                y=temp_min,
+                mode='lines+markers',
+                name='Min Temperature',
+                line=dict(color='blue', width=3),
+                marker=dict(size=8)
+            ),
+            go.Scatter(
+                x=years,
+                y=temp_mean,
+                mode='lines+markers',
+                name='Mean Temperature',
+                line=dict(color='orange', width=3),
+                marker=dict(size=8)
+            )
+        ])
         
         fig_temp.update_layout(
             title='5-Year Temperature Trends',
-            xaxis_title='Year',
             yaxis_title='Temperature (°F)',
-            hovermode='x unified',
-            height=400
+            **BASE_LAYOUT
         )
         
         st.plotly_chart(fig_temp, use_container_width=True)
@@ -348,31 +383,30 @@ def create_weather_visualizations(metrics):
         # Wind speed visualization
         fig_wind = go.Figure()
         
-        fig_wind.add_trace(go.Scatter(
-            x=years,
-            y=raw_data['wind_speed_10m_max'],
-            mode='lines+markers',
-            name='Max Wind Speed',
-            line=dict(color='green', width=3),
-            marker=dict(size=8),
-            fill='tonexty'
-        ))
-        
-        fig_wind.add_trace(go.Scatter(
-            x=years,
-            y=raw_data['wind_gusts_10m_max'],
-            mode='lines+markers',
-            name='Max Wind Gusts',
-            line=dict(color='darkgreen', width=3),
-            marker=dict(size=8)
-        ))
+        fig_wind.add_traces([
+            go.Scatter(
+                x=years,
+                y=wind_max,
+                mode='lines+markers',
+                name='Max Wind Speed',
+                line=dict(color='green', width=3),
+                marker=dict(size=8),
+                fill='tonexty'
+            ),
+            go.Scatter(
+                x=years,
+                y=gusts_max,
+                mode='lines+markers',
+                name='Max Wind Gusts',
+                line=dict(color='darkgreen', width=3),
+                marker=dict(size=8)
+            )
+        ])
         
         fig_wind.update_layout(
             title='5-Year Wind Speed Trends',
-            xaxis_title='Year',
             yaxis_title='Wind Speed (mph)',
-            hovermode='x unified',
-            height=400
+            **BASE_LAYOUT
         )
         
         st.plotly_chart(fig_wind, use_container_width=True)
@@ -383,103 +417,88 @@ def create_weather_visualizations(metrics):
         
         fig_precip.add_trace(go.Bar(
             x=years,
-            y=raw_data['precipitation_sum'],
+            y=precip,
             name='Daily Precipitation',
             marker_color='lightblue',
-            text=[f"{val:.2f} in" for val in raw_data['precipitation_sum']],
+            text=precip_text,
             textposition='auto'
         ))
         
         fig_precip.update_layout(
             title='5-Year Precipitation Patterns',
-            xaxis_title='Year',
             yaxis_title='Precipitation (inches)',
-            height=400
+            **BASE_LAYOUT
         )
         
         st.plotly_chart(fig_precip, use_container_width=True)
 
+STATS_ROWS = (
+    ('Temperature (°F)', 'Average', 'avg_temp'),
+    ('Temperature (°F)', 'Minimum', 'min_temp'),
+    ('Temperature (°F)', 'Maximum', 'max_temp'),
+    ('Wind Speed (mph)', 'Average', 'avg_wind'),
+    ('Wind Speed (mph)', 'Minimum', 'min_wind'),
+    ('Wind Speed (mph)', 'Maximum', 'max_wind'),
+    ('Precipitation (inches)', 'Total', 'sum_precip'),
+    ('Precipitation (inches)', 'Minimum', 'min_precip'),
+    ('Precipitation (inches)', 'Maximum', 'max_precip')
+)
+
 def create_statistics_table(weather_data):
     """Create a detailed statistics table"""
     
-    stats_data = {
-        'Metric': [
-            'Temperature (°F)',
-            'Temperature (°F)',
-            'Temperature (°F)',
-            'Wind Speed (mph)',
-            'Wind Speed (mph)',
-            'Wind Speed (mph)',
-            'Precipitation (inches)',
-            'Precipitation (inches)',
-            'Precipitation (inches)'
-        ],
-        'Statistic': [
-            'Average', 'Minimum', 'Maximum',
-            'Average', 'Minimum', 'Maximum',
-            'Total', 'Minimum', 'Maximum'
-        ],
-        'Value': [
-            f"{weather_data['avg_temp']:.2f}",
-            f"{weather_data['min_temp']:.2f}",
-            f"{weather_data['max_temp']:.2f}",
-            f"{weather_data['avg_wind']:.2f}",
-            f"{weather_data['min_wind']:.2f}",
-            f"{weather_data['max_wind']:.2f}",
-            f"{weather_data['sum_precip']:.2f}",
-            f"{weather_data['min_precip']:.2f}",
-            f"{weather_data['max_precip']:.2f}"
-        ]
-    }
+    rows = [(metric, statistic, f"{getattr(weather_data, field):.2f}") for metric, statistic, field in STATS_ROWS]
     
-    df = pd.DataFrame(stats_data)
+    df = pd.DataFrame(rows, columns=['Metric', 'Statistic', 'Value'])
     st.dataframe(df, use_container_width=True, hide_index=True)
 
-def calculate_weather_risk(weather_data):
-    """Calculate a simple weather risk assessment"""
-    risk_factors = 0
-    
-    # High temperature risk
-    if weather_data['max_temp'] > 90:
-        risk_factors += 2
-    elif weather_data['max_temp'] > 85:
-        risk_factors += 1
-    
-    # High wind risk
-    if weather_data['max_wind'] > 25:
-        risk_factors += 2
-    elif weather_data['max_wind'] > 15:
-        risk_factors += 1
+RISK_DESCRIPTIONS = {
+    "High": "Consider indoor alternatives",
+    "Medium": "Have backup plans ready",
+    "Low": "Good conditions expected"
+}
+
+def calculate_weather_risk_levels(max_temp, max_wind, sum_precip):
+    """Vectorized weather risk levels for whole arrays of analyses"""
+    max_temp = np.asarray(max_temp, dtype=float)
+    max_wind = np.asarray(max_wind, dtype=float)
+    sum_precip = np.asarray(sum_precip, dtype=float)
     
-    # Precipitation risk
-    if weather_data['sum_precip'] > 1.0:
-        risk_factors += 2
-    elif weather_data['sum_precip'] > 0.5:
-        risk_factors += 1
+    # Each factor adds 2 above its high threshold and 1 above its moderate one
+    risk_factors = (
+        (max_temp > 90).astype(np.int8) + (max_temp > 85)       # High temperature risk
+        + (max_wind > 25).astype(np.int8) + (max_wind > 15)     # High wind risk
+        + (sum_precip > 1.0).astype(np.int8) + (sum_precip > 0.5)  # Precipitation risk
+    )
     
-    if risk_factors >= 4:
-        return {"level": "High", "description": "Consider indoor alternatives"}
-    elif risk_factors >= 2:
-        return {"level": "Medium", "description": "Have backup plans ready"}
-    else:
-        return {"level": "Low", "description": "Good conditions expected"}
+    return np.where(risk_factors >= 4, "High", np.where(risk_factors >= 2, "Medium", "Low"))
+
+def calculate_weather_risk(weather_data):
+    """Calculate a simple weather risk assessment"""
+    level = calculate_weather_risk_levels(
+        weather_data.max_temp, weather_data.max_wind, weather_data.sum_precip
+    ).item()
+    return {"level": level, "description": RISK_DESCRIPTIONS[level]}
 
 def show_database_records():
     """Display stored weather analysis records"""
     try:
-        # Connect to database and fetch records
-        import sqlite3
-        conn = sqlite3.connect('weather.db')
+        # Fetch records over the shared connection
+        conn, lock = _db_conn()
         query = """
-        SELECT latitude, longitude, month, day, year, avg_temp, max_wind, sum_precip
+        SELECT latitude, longitude, month, day, year, avg_temp, max_temp, max_wind, sum_precip
         FROM weather_data
         ORDER BY year DESC, month DESC, day DESC
         LIMIT 10
         """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        with lock:
+            cursor = conn.execute(query)
+            columns = [column[0] for column in cursor.description]
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
         
         if not df.empty:
+            # Score every stored analysis in one vectorized pass
+            df['risk'] = calculate_weather_risk_levels(df['max_temp'], df['max_wind'], df['sum_precip'])
             st.subheader("📚 Recent Analyses")
             st.dataframe(df, use_container_width=True)
         else:
@@ -1,25 +1,60 @@
 import streamlit as st
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import pandas as pd
+import numpy as np
 import calendar
+import functools
+import io
+
+@st.cache_resource
+def _get_geolocator():
+    """
+    Build the Nominatim geocoder once and share it across sessions
+    geopy is imported here so it only loads when a lookup is made
+    """
+    from geopy.geocoders import Nominatim
+    
+    # Initialize geocoder with a user agent
+    return Nominatim(user_agent="weather_prediction_app")
+
+def _rate_limited(func):
+    """Wrap a geocoder call to respect Nominatim's one request per second policy"""
+    from geopy.extra.rate_limiter import RateLimiter
+    
+    # Errors are re-raised after retrying so callers can report them
+    return RateLimiter(func, min_delay_seconds=1, max_retries=2, error_wait_seconds=2, swallow_exceptions=False)
+
+@st.cache_resource
+def _nominatim():
+    """
+    Shared rate-limited Nominatim caller, called as _nominatim()('geocode' or 'reverse', ...)
+    Forward and reverse lookups go through one limiter so together they stay at one request per second
+    """
+    geolocator = _get_geolocator()
+    return _rate_limited(lambda method, *args, **kwargs: getattr(geolocator, method)(*args, **kwargs))
+
+@st.cache_data(ttl=7 * 24 * 3600, show_spinner=False)
+def _geocode(location_name):
+    """
+    Cached Nominatim lookup, geocoding results are essentially static
+    Errors are raised rather than returned so failures are never cached
+    """
+    # Get location
+    location = _nominatim()('geocode', location_name, timeout=10)
+    
+    if location:
+        return (location.latitude, location.longitude)
+    else:
+        return None
 
 def get_coordinates_from_location(location_name):
     """
     Convert location name to latitude and longitude coordinates
     Returns tuple (latitude, longitude) or None if not found
     """
+    from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+    
     try:
-        # Initialize geocoder with a user agent
-        geolocator = Nominatim(user_agent="weather_prediction_app")
-        
-        # Get location
-        location = geolocator.geocode(location_name, timeout=10)
-        
-        if location:
-            return (location.latitude, location.longitude)
-        else:
-            return None
+        return _geocode(location_name)
             
     except (GeocoderTimedOut, GeocoderServiceError) as e:
         st.error(f"Geocoding service error: {str(e)}")
@@ -28,6 +63,10 @@ def get_coordinates_from_location(location_name):
         st.error(f"Error getting coordinates: {str(e)}")
         return None
 
+# Days in each month for a non-leap year, indexed by month number
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+@functools.lru_cache(maxsize=4096)
 def validate_date(month, day, year):
     """
     Validate if the given date is valid
@@ -35,29 +74,12 @@ def validate_date(month, day, year):
     """
     try:
         # Check basic ranges
-        if not (1 <= month <= 12):
-            return False
-        
-        if not (1940 <= year <= 2030):
+        if not (1 <= month <= 12 and 1940 <= year <= 2030):
             return False
         
-        # Check if day is valid for the given month
-        if month in [1, 3, 5, 7, 8, 10, 12]:  # 31-day months
-            if not (1 <= day <= 31):
-                return False
-        elif month in [4, 6, 9, 11]:  # 30-day months
-            if not (1 <= day <= 30):
-                return False
-        else:  # February
-            # Check for leap year
-            if calendar.isleap(year):
-                if not (1 <= day <= 29):
-                    return False
-            else:
-                if not (1 <= day <= 28):
-                    return False
-        
-        return True
+        # Check if day is valid for the given month, February gains a day in leap years
+        max_day = _DAYS_IN_MONTH[month] + (1 if month == 2 and calendar.isleap(year) else 0)
+        return 1 <= day <= max_day
         
     except Exception:
         return False
@@ -92,14 +114,39 @@ def format_weather_data(weather_data):
         st.error(f"Error formatting data for export: {str(e)}")
         return ""
 
+def compact_raw_data(raw_data):
+    """
+    Reduce the 5-year weather data to the small arrays the charts need
+    Returns dictionary of float32 arrays plus an int16 'year' array
+    """
+    compact = {key: np.ascontiguousarray(values, dtype=np.float32) for key, values in raw_data.items() if key != 'date'}
+    compact['year'] = (np.asarray(raw_data['date']).astype('datetime64[Y]').astype(np.int64) + 1970).astype(np.int16)
+    return compact
+
+def pack_raw_data(raw_data):
+    """
+    Serialize the compact 5-year weather arrays for database storage
+    Returns bytes (NumPy .npz archive)
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, **raw_data)
+    return buffer.getvalue()
+
+def unpack_raw_data(blob):
+    """
+    Rebuild the compact 5-year weather arrays from database storage
+    Returns dictionary of arrays in the same shape as compact_raw_data
+    """
+    with np.load(io.BytesIO(blob)) as stored:
+        return {key: stored[key] for key in stored.files}
+
 def get_location_display_name(latitude, longitude):
     """
     Get a human-readable location name from coordinates
     Returns location name string or coordinates if name not found
     """
     try:
-        geolocator = Nominatim(user_agent="weather_prediction_app")
-        location = geolocator.reverse(f"{latitude}, {longitude}", timeout=10)
+        location = _nominatim()('reverse', f"{latitude}, {longitude}", timeout=10)
         
         if location:
             return location.address
@@ -109,36 +156,36 @@ def get_location_display_name(latitude, longitude):
     except Exception:
         return f"{latitude:.4f}°N, {longitude:.4f}°W"
 
-def calculate_weather_suitability_score(weather_data):
+def calculate_weather_suitability_scores(avg_temp, max_wind, sum_precip):
     """
-    Calculate a weather suitability score for outdoor events
-    Returns score from 0-100 (higher is better)
+    Vectorized weather suitability scores for whole arrays of analyses
+    Returns integer array of scores from 0-100 (higher is better)
     """
-    score = 100
+    avg_temp = np.asarray(avg_temp, dtype=float)
+    max_wind = np.asarray(max_wind, dtype=float)
+    sum_precip = np.asarray(sum_precip, dtype=float)
     
     # Temperature scoring (ideal range: 70-80°F)
-    if weather_data.avg_temp < 60 or weather_data.avg_temp > 90:
-        score -= 30
-    elif weather_data.avg_temp < 70 or weather_data.avg_temp > 80:
-        score -= 15
+    temp_penalty = np.select(
+        [(avg_temp < 60) | (avg_temp > 90), (avg_temp < 70) | (avg_temp > 80)], [30, 15], 0
+    )
     
     # Wind speed scoring (ideal: < 10 mph)
-    if weather_data.max_wind > 25:
-        score -= 25
-    elif weather_data.max_wind > 15:
-        score -= 15
-    elif weather_data.max_wind > 10:
-        score -= 10
+    wind_penalty = np.select([max_wind > 25, max_wind > 15, max_wind > 10], [25, 15, 10], 0)
     
     # Precipitation scoring (ideal: minimal precipitation)
-    if weather_data.sum_precip > 1.0:
-        score -= 20
-    elif weather_data.sum_precip > 0.5:
-        score -= 10
-    elif weather_data.sum_precip > 0.1:
-        score -= 5
+    precip_penalty = np.select([sum_precip > 1.0, sum_precip > 0.5, sum_precip > 0.1], [20, 10, 5], 0)
     
-    return max(0, score)
+    return np.maximum(0, 100 - temp_penalty - wind_penalty - precip_penalty)
+
+def calculate_weather_suitability_score(weather_data):
+    """
+    Calculate a weather suitability score for outdoor events
+    Returns score from 0-100 (higher is better)
+    """
+    return int(calculate_weather_suitability_scores(
+        weather_data.avg_temp, weather_data.max_wind, weather_data.sum_precip
+    ))
 
 def get_weather_recommendations(weather_data):
     """
@@ -2,10 +2,149 @@
 
 import openmeteo_requests
 import requests_cache
+import streamlit as st
 import pandas as pd
 pd.set_option('display.max_columns', 10) #Expand Columns
+import numpy as np
 from retry_requests import retry
+from requests.adapters import HTTPAdapter
 from datetime import datetime
+from dataclasses import dataclass
+import calendar
+
+# Give Up on a Stalled Request Instead of Hanging the Session (Connect, Read Seconds)
+_API_TIMEOUT = (5, 15)
+# Refuse Absurdly Large Responses Before They Get Parsed
+_MAX_RESPONSE_BYTES = 10_000_000
+
+def _check_response_size(response, *args, **kwargs):
+    if len(response.content) > _MAX_RESPONSE_BYTES:
+        raise ValueError(f"Weather API response too large ({len(response.content)} bytes)")
+
+# Set up the Open-Meteo API client with cache and retry on error
+# Built Once per Process so Every Request Reuses the Same Cache File and Connection Pool
+_CACHE = requests_cache.CachedSession('.cache', expire_after=-1)
+_RETRY = retry(_CACHE, retries=5, backoff_factor=0.2)
+# Bigger Connection Pool, Keeping the Retry Policy retry() Just Mounted
+_RETRY.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=8,
+                                     max_retries=_RETRY.get_adapter('https://').max_retries))
+_RETRY.hooks['response'].append(_check_response_size)
+_OPENMETEO = openmeteo_requests.Client(session=_RETRY)
+
+# C.2: Go Back 5 Years
+
+# The 5 Full Years Before the Current One, so the Window Moves Every New Year
+def _window_bounds():
+    now_year = datetime.now().year
+    return now_year - 5, now_year - 1
+
+# Years an Analysis Run Today Covers for a Month/Day (Feb 29 Only Falls in Leap Years)
+# Used to Tell Whether a Stored Analysis Still Matches the Current Window
+def analysis_years(month, day):
+    first_year, last_year = _window_bounds()
+    return tuple(year for year in range(first_year, last_year + 1)
+                 if day <= calendar.monthrange(year, month)[1])
+
+# Cached by Streamlit Across Reruns and Sessions for a Day, Keyed by the Window Years Too
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def _fetch_5yr(latitude, longitude, month, day, first_year, last_year):
+    # One Request Covering the Past 5 Years
+    # Range Runs from the Start of the Month 5 Years Ago to the End of the Month Last Year,
+    # so Feb 29 Never Has to be Built for a Non-Leap Year
+    start_date = datetime(first_year, month, 1)
+    end_date = datetime(last_year, month, calendar.monthrange(last_year, month)[1])
+    all_days = _call_api(latitude, longitude, start_date, end_date)
+
+    # Keep Only the Chosen Month/Day from Each Year
+    # Month and Day Worked Out with datetime64 Arithmetic, No Python datetime per Day
+    dates = all_days['date']
+    month_starts = dates.astype('datetime64[M]')
+    months = month_starts.astype(np.int64) % 12 + 1
+    days = (dates.astype('datetime64[D]') - month_starts).astype(np.int64) + 1
+    mask = (months == month) & (days == day)
+    chosen_date_data = {key: values[mask] for key, values in all_days.items()}
+
+    # Dictionary of Small NumPy Arrays, One Value per Year
+    return chosen_date_data
+
+# Calling API with Specific Start and End Date
+def _call_api(latitude, longitude, start_date, end_date):
+
+    # C.2: Generated Weather API - START
+
+    # Shared Open-Meteo API client
+    openmeteo = _OPENMETEO
+    # Make sure all required weather variables are listed here
+    # The order of variables in hourly or daily is important to assign them correctly below
+    url = "https://archive-api.open-meteo.com/v1/archive"
+
+    # Continue Website Weather API - Sets Query Parameters for API GET Request
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "daily": ["temperature_2m_max", "temperature_2m_min", "temperature_2m_mean", "precipitation_sum",
+                  "wind_speed_10m_max", "wind_gusts_10m_max"],
+        "temperature_unit": "fahrenheit",
+        "wind_speed_unit": "mph",
+        "precipitation_unit": "inch"
+    }
+    responses = openmeteo.weather_api(url, params=params, timeout=_API_TIMEOUT)
+
+    # Process first location. Add a for-loop for multiple locations or weather models
+    response = responses[0]
+
+    # Process daily data. The order of variables needs to be the same as requested.
+    daily = response.Daily()
+    daily_temperature_2m_max = daily.Variables(0).ValuesAsNumpy()
+    daily_temperature_2m_min = daily.Variables(1).ValuesAsNumpy()
+    daily_temperature_2m_mean = daily.Variables(2).ValuesAsNumpy()
+    daily_precipitation_sum = daily.Variables(3).ValuesAsNumpy()
+    daily_wind_speed_10m_max = daily.Variables(4).ValuesAsNumpy()
+    daily_wind_gusts_10m_max = daily.Variables(5).ValuesAsNumpy()
+
+    # Plain NumPy datetime64 (UTC Seconds) Instead of a pandas DatetimeIndex
+    daily_data = {"date": np.arange(daily.Time(), daily.TimeEnd(), daily.Interval(), dtype = np.int64).astype("datetime64[s]")}
+    # Copied Over for Key Names
+    daily_data["temperature_2m_max"] = daily_temperature_2m_max
+    daily_data["temperature_2m_min"] = daily_temperature_2m_min
+    daily_data["temperature_2m_mean"] = daily_temperature_2m_mean
+    daily_data["precipitation_sum"] = daily_precipitation_sum
+    daily_data["wind_speed_10m_max"] = daily_wind_speed_10m_max
+    daily_data["wind_gusts_10m_max"] = daily_wind_gusts_10m_max
+
+    return daily_data
+
+# C.2: Generated Weather API - END
+
+# Compute the 9 Statistics Together, in WeatherResult Field Order
+# NaN-Skipping Like pandas, so a Missing Day from the API Doesn't Blank the Result
+# Converted to Python Floats for Storage
+def _summary_stats(temp_max, temp_min, temp_mean, wind_max, precip):
+    return tuple(float(value) for value in (
+        np.nanmean(temp_mean), np.nanmin(temp_min), np.nanmax(temp_max),
+        np.nanmean(wind_max), np.nanmin(wind_max), np.nanmax(wind_max),
+        np.nansum(precip), np.nanmin(precip), np.nanmax(precip)
+    ))
+
+# Results of One Analysis, Shared by the Database, Session State and CSV Export
+@dataclass(slots=True)
+class WeatherResult:
+    latitude: float
+    longitude: float
+    month: int
+    day: int
+    year: int
+    avg_temp: float
+    min_temp: float
+    max_temp: float
+    avg_wind: float
+    min_wind: float
+    max_wind: float
+    sum_precip: float
+    min_precip: float
+    max_precip: float
 
 # C.1: Add Instance Variables for Location & Date
 
@@ -33,126 +172,43 @@ class WeatherMetrics:
     def fill_out_class(self):
         # Grabbing Data from Website API
         chosen_date_data = self.get_data_for_date()
-
-        # Calls Methods for Getting Averages/Max/Sum and Calculates Data
-        self.avg_temp = self.calc_avg_temp(chosen_date_data)
-        self.min_temp = chosen_date_data['temperature_2m_min'].min()
-        self.max_temp = chosen_date_data['temperature_2m_max'].max()
-        self.avg_wind = chosen_date_data['wind_speed_10m_max'].mean()
-        self.min_wind = chosen_date_data['wind_speed_10m_max'].min()
-        self.max_wind = self.calc_wind_speed_max(chosen_date_data)
-        self.sum_precip = self.calc_total_precip(chosen_date_data)
-        self.min_precip = chosen_date_data['precipitation_sum'].min()
-        self.max_precip = chosen_date_data['precipitation_sum'].max()
+        # Kept for Charts so They Don't Have to Call the API Again
+        self.raw_data = chosen_date_data
+
+        # Calculates All Averages/Minimums/Maximums/Sum in One Call
+        (self.avg_temp, self.min_temp, self.max_temp,
+         self.avg_wind, self.min_wind, self.max_wind,
+         self.sum_precip, self.min_precip, self.max_precip) = _summary_stats(
+            chosen_date_data['temperature_2m_max'],
+            chosen_date_data['temperature_2m_min'],
+            chosen_date_data['temperature_2m_mean'],
+            chosen_date_data['wind_speed_10m_max'],
+            chosen_date_data['precipitation_sum']
+        )
+
+        # Collect Everything into One Result Object
+        self.result = WeatherResult(
+            latitude=self.latitude,
+            longitude=self.longitude,
+            month=self.month,
+            day=self.day,
+            year=self.year,
+            avg_temp=self.avg_temp,
+            min_temp=self.min_temp,
+            max_temp=self.max_temp,
+            avg_wind=self.avg_wind,
+            min_wind=self.min_wind,
+            max_wind=self.max_wind,
+            sum_precip=self.sum_precip,
+            min_precip=self.min_precip,
+            max_precip=self.max_precip
+        )
 
     # Create Method to Call Weather API
     def get_data_for_date(self):
+        # Cached per Location/Date, so Repeat Analyses Skip the API
+        return _fetch_5yr(self.latitude, self.longitude, self.month, self.day, *_window_bounds())
 
 # C.1 Summary: Created Class with Variables, Filled Out Variables with Methods
 
-# C.2: Create Loop to Go Back 5 Years
-
-        # Create Structure for Adding Each Year's Data
-        chosen_date_data = {
-        'date': [],
-        'temperature_2m_max': [],
-        'temperature_2m_min': [],
-        'temperature_2m_mean': [],
-        'precipitation_sum': [],
-        'wind_speed_10m_max': [],
-        'wind_gusts_10m_max': [],
-        }
-        # Looping Back 5 Years
-        for i in range(1, 6):
-            start_date = datetime(datetime.now().year - i, self.month, self.day)
-            end_date = start_date #Grabbing only 1 date, so start date = end date
-            data_for_that_year = self.call_api(start_date, end_date)
-            chosen_date_data['date'].append(data_for_that_year['date'][0]) #Append Data
-            # Adding Each Years Worth of Data to Our Object
-            chosen_date_data['temperature_2m_max'].append(data_for_that_year['temperature_2m_max'][0])
-            chosen_date_data['temperature_2m_min'].append(data_for_that_year['temperature_2m_min'][0])
-            chosen_date_data['temperature_2m_mean'].append(data_for_that_year['temperature_2m_mean'][0])
-            chosen_date_data['precipitation_sum'].append(data_for_that_year['precipitation_sum'][0])
-            chosen_date_data['wind_speed_10m_max'].append(data_for_that_year['wind_speed_10m_max'][0])
-            chosen_date_data['wind_gusts_10m_max'].append(data_for_that_year['wind_gusts_10m_max'][0])
-
-        # Panda Library
-        all = pd.DataFrame(data=chosen_date_data)
-
-        return all
-
-    # Calling API with Specific Start and End Date
-    def call_api(self, start_date, end_date):
-
-        # C.2: Generated Weather API - START
-
-        # Set up the Open-Meteo API client with cache and retry on error
-        cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-        openmeteo = openmeteo_requests.Client(session=retry_session)
-        # Make sure all required weather variables are listed here
-        # The order of variables in hourly or daily is important to assign them correctly below
-        url = "https://archive-api.open-meteo.com/v1/archive"
-
-        # Continue Website Weather API - Sets Query Parameters for API GET Request
-        params = {
-            "latitude": self.latitude,
-            "longitude": self.longitude,
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": end_date.strftime("%Y-%m-%d"),
-            "daily": ["temperature_2m_max", "temperature_2m_min", "temperature_2m_mean", "precipitation_sum",
-                      "wind_speed_10m_max", "wind_gusts_10m_max"],
-            "temperature_unit": "fahrenheit",
-            "wind_speed_unit": "mph",
-            "precipitation_unit": "inch"
-        }
-        responses = openmeteo.weather_api(url, params=params)
-
-        # Process first location. Add a for-loop for multiple locations or weather models
-        response = responses[0]
-
-        # Process daily data. The order of variables needs to be the same as requested.
-        daily = response.Daily()
-        daily_temperature_2m_max = daily.Variables(0).ValuesAsNumpy()
-        daily_temperature_2m_min = daily.Variables(1).ValuesAsNumpy()
-        daily_temperature_2m_mean = daily.Variables(2).ValuesAsNumpy()
-        daily_precipitation_sum = daily.Variables(3).ValuesAsNumpy()
-        daily_wind_speed_10m_max = daily.Variables(4).ValuesAsNumpy()
-        daily_wind_gusts_10m_max = daily.Variables(5).ValuesAsNumpy()
-
-        daily_data = {"date": pd.date_range(
-            start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
-            end = pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
-            freq = pd.Timedelta(seconds = daily.Interval()),
-            inclusive = "left"
-        )}
-        # Copied Over for Key Names
-        daily_data["temperature_2m_max"] = daily_temperature_2m_max
-        daily_data["temperature_2m_min"] = daily_temperature_2m_min
-        daily_data["temperature_2m_mean"] = daily_temperature_2m_mean
-        daily_data["precipitation_sum"] = daily_precipitation_sum
-        daily_data["wind_speed_10m_max"] = daily_wind_speed_10m_max
-        daily_data["wind_gusts_10m_max"] = daily_wind_gusts_10m_max
-
-        return daily_data
-
-# C.2: Generated Weather API - END
-
-    # C.2: Write Out Methods
-
-    # Calculate the Average Temperature
-    @staticmethod
-    def calc_avg_temp(data):
-        return data['temperature_2m_mean'].mean()
-
-    # Calculate Maximum Wind Speed
-    @staticmethod
-    def calc_wind_speed_max(data):
-        return data['wind_speed_10m_max'].max()
-
-    # Calculate the Total Precipitation
-    @staticmethod
-    def calc_total_precip(data):
-        return data['precipitation_sum'].sum()
-
 # C.2 Summary: Called API, Created Loop, Performed Calculations
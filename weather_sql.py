@@ -1,87 +1,324 @@
 
 #C.4: Import SQLAlchemy ORM Module
-from sqlalchemy import Column, Integer, Float, create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import sys
+from collections import namedtuple
+from dataclasses import asdict, is_dataclass
+from functools import lru_cache
+from itertools import islice
+import numpy as np
+import pandas as pd
+from sqlalchemy import Integer, SmallInteger, Float, LargeBinary, Index, create_engine, event, inspect, select, bindparam, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 
-# Define the Base Class for Models & Create Engine
-engine = create_engine('sqlite:///weather.db')
-base = declarative_base()
+# Create Engine
+# Pooled Connections so Repeat Calls Reuse an Open weather.db Instead of Reopening the File Each Time
+# (Older SQLAlchemy Defaulted File Databases to NullPool); Shared Across Streamlit's Script Threads
+engine = create_engine(
+    'sqlite:///weather.db',
+    connect_args={'check_same_thread': False},
+    poolclass=QueuePool
+)
+
+# Tune Each New SQLite Connection
+# WAL Keeps Reads from Blocking on Inserts, and with WAL synchronous=NORMAL Skips the fsync on Every Commit
+# Temp Tables in Memory, a 64 MB Page Cache and 256 MB of Memory-Mapped I/O for Bulk Loads
+_SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-64000",
+    "mmap_size=268435456",
+)
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in _SQLITE_PRAGMAS:
+        cursor.execute("PRAGMA " + pragma)
+    cursor.close()
+
+# Second Engine for Reads Only; WAL Lets These Run While the Main Engine Writes
+# The File is Memory-Mapped so Lookups Read Pages Straight from the Mapping
+ro_engine = create_engine(
+    'sqlite:///file:weather.db?mode=ro&uri=true',
+    connect_args={'check_same_thread': False},
+    poolclass=QueuePool
+)
+
+@event.listens_for(ro_engine, "connect")
+def _set_sqlite_read_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA mmap_size=1073741824")
+    cursor.execute("PRAGMA query_only=1")
+    cursor.close()
+
+# Natural Key of an Analysis: One Row per Date & Location
+_WEATHER_KEY = ('year', 'month', 'day', 'latitude', 'longitude')
+
+# Base Class for Models, SQLAlchemy 2.0 Typed Declarative Style
+class Base(DeclarativeBase):
+    pass
 
 
 # C.4: Create Class for SQLite Table
-class WeatherData(base):
+class WeatherData(Base):
     __tablename__ = "weather_data"  # Name of the SQLite table
+    # One Analysis per Date & Location; Date-First so fetch() by Date Uses the Same Index
+    __table_args__ = (
+        Index('ux_weather_location_date', *_WEATHER_KEY, unique=True),
+        # Calendar-Date Lookups Across Years, Used to Refresh One Row of weather_daily_summary
+        Index('ix_weather_month_day', 'month', 'day'),
+    )
     # Add Key & Increment
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    # Add Table Columns
-    latitude = Column(Float)
-    longitude = Column(Float)
-    month = Column(Integer)
-    day = Column(Integer)
-    year = Column(Integer)
-    avg_temp = Column(Float)
-    min_temp = Column(Float)
-    max_temp = Column(Float)
-    avg_wind = Column(Float)
-    min_wind = Column(Float)
-    max_wind = Column(Float)
-    sum_precip = Column(Float)
-    min_precip = Column(Float)
-    max_precip = Column(Float)
-
-# Create Database Table
-base.metadata.create_all(engine)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Add Table Columns (Dates Fit in 2 Bytes)
+    latitude: Mapped[float | None] = mapped_column(Float)
+    longitude: Mapped[float | None] = mapped_column(Float)
+    month: Mapped[int | None] = mapped_column(SmallInteger)
+    day: Mapped[int | None] = mapped_column(SmallInteger)
+    year: Mapped[int | None] = mapped_column(SmallInteger)
+    avg_temp: Mapped[float | None] = mapped_column(Float)
+    min_temp: Mapped[float | None] = mapped_column(Float)
+    max_temp: Mapped[float | None] = mapped_column(Float)
+    avg_wind: Mapped[float | None] = mapped_column(Float)
+    min_wind: Mapped[float | None] = mapped_column(Float)
+    max_wind: Mapped[float | None] = mapped_column(Float)
+    sum_precip: Mapped[float | None] = mapped_column(Float)
+    min_precip: Mapped[float | None] = mapped_column(Float)
+    max_precip: Mapped[float | None] = mapped_column(Float)
+
+# Class for the Raw 5-Year Arrays Behind Each Analysis, Used to Redraw Charts Without the API
+class WeatherRawData(Base):
+    __tablename__ = "weather_raw"
+    # One Set of Arrays per Date & Location, Matching weather_data's Key
+    __table_args__ = (Index('ux_weather_raw_location_date', *_WEATHER_KEY, unique=True),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    latitude: Mapped[float | None] = mapped_column(Float)
+    longitude: Mapped[float | None] = mapped_column(Float)
+    month: Mapped[int | None] = mapped_column(SmallInteger)
+    day: Mapped[int | None] = mapped_column(SmallInteger)
+    year: Mapped[int | None] = mapped_column(SmallInteger)
+    arrays: Mapped[bytes | None] = mapped_column(LargeBinary)  # NumPy .npz archive of the daily values
+
+# Class for Summary Statistics per Calendar Date
+# Rebuilt in the Same Transaction as Every weather_data Write (insert_data and insert_many)
+# Pooled Over Every Stored Location and Year: One Row per (month, day), NOT Per-Location Data
+# At Most 366 Rows, Stored Clustered on (month, day) so a Lookup is One B-Tree Descent
+class WeatherDailySummary(Base):
+    __tablename__ = "weather_daily_summary"
+    __table_args__ = {'sqlite_with_rowid': False}
+    month: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    day: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    avg_temp: Mapped[float | None] = mapped_column(Float)
+    min_temp: Mapped[float | None] = mapped_column(Float)
+    max_temp: Mapped[float | None] = mapped_column(Float)
+    avg_wind: Mapped[float | None] = mapped_column(Float)
+    min_wind: Mapped[float | None] = mapped_column(Float)
+    max_wind: Mapped[float | None] = mapped_column(Float)
+    sum_precip: Mapped[float | None] = mapped_column(Float)
+    min_precip: Mapped[float | None] = mapped_column(Float)
+    max_precip: Mapped[float | None] = mapped_column(Float)
+
+# Create Database Tables
+# Summary Table is Filled from Existing Rows the First Time it is Created (See Below)
+_summary_is_new = not inspect(engine).has_table(WeatherDailySummary.__tablename__)
+Base.metadata.create_all(engine)
+# Older Databases Have Separate Non-Unique Indexes and May Hold Repeat Analyses
+# Keep the Newest Row per Date & Location so the Unique Index Below Can be Built
+if 'ux_weather_location_date' not in {index['name'] for index in inspect(engine).get_indexes('weather_data')}:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_weather_location_date")
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_weather_ymd")
+        conn.exec_driver_sql(
+            "DELETE FROM weather_data WHERE id NOT IN "
+            "(SELECT MAX(id) FROM weather_data GROUP BY year, month, day, latitude, longitude)"
+        )
+# Older Databases Also Append a Raw Row per Analysis; Keep the Newest per Date & Location
+if 'ux_weather_raw_location_date' not in {index['name'] for index in inspect(engine).get_indexes('weather_raw')}:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_weather_raw_location_date")
+        conn.exec_driver_sql(
+            "DELETE FROM weather_raw WHERE id NOT IN "
+            "(SELECT MAX(id) FROM weather_raw GROUP BY year, month, day, latitude, longitude)"
+        )
+# create_all Skips Tables That Already Exist, so Add Any Missing Indexes to Older Databases
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
 
 #C.4 Summary: Created SQL Table
 
+# One Session per Thread, Reused Across Calls; Objects Stay Readable After Commit
+Session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+
+# Plain Immutable Copy of a weather_data Row, Safe to Keep After the Session Closes
+WeatherRow = namedtuple('WeatherRow', [column.name for column in WeatherData.__table__.columns])
+
+# Columns and Compact Types Used for Whole-Table Analytics
+_RECORD_COLUMNS = ['latitude', 'longitude', 'year', 'month', 'day', 'avg_temp', 'min_temp', 'max_temp',
+                   'avg_wind', 'min_wind', 'max_wind', 'sum_precip', 'min_precip', 'max_precip']
+_RECORD_DTYPE = np.dtype([(name, 'i2' if name in ('year', 'month', 'day') else 'f4') for name in _RECORD_COLUMNS])
+
+# Date Lookup Built Once at Import; SQLAlchemy Reuses its Compiled Form for Every Call
+_FETCH_STMT = select(WeatherData.__table__).where(
+    WeatherData.month == bindparam('m'),
+    WeatherData.day == bindparam('d'),
+    WeatherData.year == bindparam('y')
+).limit(1)
+
+# Repeat Lookups of the Same Date Skip SQLite; Cleared Whenever Rows are Inserted
+@lru_cache(maxsize=4096)
+def _fetch_row(month, day, year):
+    # Plain Pooled Connection, No Session or ORM Bookkeeping for a Read-Only Lookup
+    with ro_engine.connect() as conn:
+        weather = conn.execute(_FETCH_STMT, {'m': month, 'd': day, 'y': year}).first()
+    if weather is None:
+        return None
+    return WeatherRow(*weather)
+
+# Summary Statistics Computed Inside SQLite, Labelled with the Column They Summarize
+_AGGREGATES = (
+    func.avg(WeatherData.avg_temp).label('avg_temp'),
+    func.min(WeatherData.min_temp).label('min_temp'),
+    func.max(WeatherData.max_temp).label('max_temp'),
+    func.avg(WeatherData.avg_wind).label('avg_wind'),
+    func.min(WeatherData.min_wind).label('min_wind'),
+    func.max(WeatherData.max_wind).label('max_wind'),
+    func.avg(WeatherData.sum_precip).label('sum_precip'),
+    func.min(WeatherData.min_precip).label('min_precip'),
+    func.max(WeatherData.max_precip).label('max_precip'),
+)
+
+# Rebuild weather_daily_summary from weather_data, for Every Date or Just One
+def _refresh_summary_stmt(month=None, day=None):
+    summary = select(WeatherData.month, WeatherData.day, *_AGGREGATES).where(
+        WeatherData.month.is_not(None), WeatherData.day.is_not(None)
+    ).group_by(WeatherData.month, WeatherData.day)
+    if month is not None:
+        summary = summary.where(WeatherData.month == month, WeatherData.day == day)
+    columns = ['month', 'day'] + [aggregate.name for aggregate in _AGGREGATES]
+    return sqlite_insert(WeatherDailySummary).prefix_with('OR REPLACE').from_select(columns, summary)
+
+if _summary_is_new:
+    with engine.begin() as conn:
+        conn.execute(_refresh_summary_stmt())
+
+# Insert that Quietly Skips Analyses Already Stored, so Backfill Re-Runs Never Abort the Transaction
+_INSERT_WEATHER = sqlite_insert(WeatherData).on_conflict_do_nothing(index_elements=list(_WEATHER_KEY))
+
+# Insert for a Single Fresh Analysis: a Repeat Date & Location Replaces the Stored Statistics
+_STAT_COLUMNS = tuple(column.name for column in WeatherData.__table__.columns
+                      if column.name != 'id' and column.name not in _WEATHER_KEY)
+_upsert = sqlite_insert(WeatherData)
+_UPSERT_WEATHER = _upsert.on_conflict_do_update(
+    index_elements=list(_WEATHER_KEY),
+    set_={name: _upsert.excluded[name] for name in _STAT_COLUMNS}
+)
+
+# Same for the Raw Arrays: a Fresh Analysis Replaces the Stored Blob
+_upsert_raw = sqlite_insert(WeatherRawData)
+_UPSERT_RAW = _upsert_raw.on_conflict_do_update(
+    index_elements=list(_WEATHER_KEY),
+    set_={'arrays': _upsert_raw.excluded.arrays}
+)
+
+# Report Layout for fetch(), Filled from a WeatherRow in One Pass
+_REPORT_TEMPLATE = (
+    "Location Latitude: {latitude:.2f}°\n"
+    "Location Longitude: {longitude:.2f}°\n"
+    "Event Date: {month}-{day}-{year}\n"
+    "5-Year Average Temperature: {avg_temp:.2f}°F\n"
+    "5-Year Minimum Temperature: {min_temp:.2f}°F\n"
+    "5-Year Maximum Temperature: {max_temp:.2f}°F\n"
+    "5-Year Average Wind Speed: {avg_wind:.2f} mph\n"
+    "5-Year Minimum Wind Speed: {min_wind:.2f} mph\n"
+    "5-Year Maximum Wind Speed: {max_wind:.2f} mph\n"
+    "5-Year Sum Precipitation: {sum_precip:.2f} inches\n"
+    "5-Year Minimum Precipitation: {min_precip:.2f} inches\n"
+    "5-Year Maximum Precipitation: {max_precip:.2f} inches\n"
+)
+
 #C.5: Create Class to Interact with Table
 class DatabaseHandler:
     def __init__(self):
-        self.Session = sessionmaker(bind=engine)
+        self.Session = Session
     # Insert Data into Table
     def insert_data(self, data):
-        # Create New Session
-        session = self.Session()
-        try:
+        # Commits on Success, Rolls Back on Error, Then Closes the Session
+        with self.Session() as session, session.begin():
+            self._write(session, data)
+        self.cache_clear()
+
+    # Store a Fresh Analysis: its Statistics and Raw Arrays Together in One Transaction
+    def save_analysis(self, result, arrays):
+        raw = {name: getattr(result, name) for name in _WEATHER_KEY}
+        with self.Session() as session, session.begin():
+            self._write(session, result)
+            self._write(session, WeatherRawData(**raw, arrays=arrays))
+        self.cache_clear()
+
+    # Upsert One Row Inside an Open Transaction
+    @staticmethod
+    def _write(session, data):
+        # Accept a WeatherResult or Model Object as a Column Dict (id Left to SQLite)
+        if is_dataclass(data):
+            data = asdict(data)
+        elif isinstance(data, (WeatherData, WeatherRawData)):
+            data = {column.name: getattr(data, column.name)
+                    for column in type(data).__table__.columns if column.name != 'id'}
+
+        # Raw Arrays Replace the Stored Blob; weather_data Rows Upsert and Refresh Their Daily Summary
+        if not isinstance(data, dict):
             session.add(data)
-            # Commit Transaction
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            # Close Session
-            session.close()
+        elif 'arrays' in data:
+            session.execute(_UPSERT_RAW, data)
+        else:
+            session.execute(_UPSERT_WEATHER, data)
+            session.execute(_refresh_summary_stmt(data['month'], data['day']))
+
+    # Insert Many Rows in One Transaction, for Backfills and Migrations
+    # Rows are Plain Dicts Keyed by Column Name, WeatherResults, or a pandas DataFrame
+    # Sent as Core executemany in batch_size Chunks so Large Loads Never Sit in Memory at Once
+    # Rows Already Stored for the Same Date & Location are Skipped
+    def insert_many(self, rows, batch_size=1000):
+        if hasattr(rows, 'to_dict'):
+            rows = rows.to_dict(orient='records')
+        rows = (asdict(row) if is_dataclass(row) else row for row in rows)
+        # One Transaction for the Whole Load, Committed Once on Success
+        with self.Session() as session, session.begin():
+            while chunk := list(islice(rows, batch_size)):
+                session.execute(_INSERT_WEATHER, chunk)
+            # Summary Rebuilt Once After the Whole Load, in the Same Transaction
+            session.execute(_refresh_summary_stmt())
+        self.cache_clear()
+
+    # Drop Cached fetch() Results so Reads See New Rows
+    @staticmethod
+    def cache_clear():
+        _fetch_row.cache_clear()
 
 #C.5 Summary: Populate Table with Weather Data
 
 #C.6: Query Data and Printing Formatted Data
+    # Pure Data Lookup, No Printing; Safe for Batch Code and the GUI
+    def fetch_row(self, month, day, year):
+        #C.6: Query Chosen Date and Selecting First Record (Cached)
+        return _fetch_row(month, day, year)
+
+    # Format a Row as the Multi-Line Report Printed by fetch()
+    @staticmethod
+    def _format(weather):
+        return _REPORT_TEMPLATE.format_map(weather._asdict())
+
     def fetch(self, month, day, year):
-        # Create a New Session
-        session = self.Session()
         try:
-            #C.6: Query Chosen Date and Selecting First Record
-            weather = session.query(WeatherData).filter(
-                WeatherData.month == month, 
-                WeatherData.day == day, 
-                WeatherData.year == year
-            ).first()
-            
+            weather = self.fetch_row(month, day, year)
+
             if weather:
                 #Print and Format Table Data
-                print(f"Location Latitude: {weather.latitude:.2f}°")
-                print(f"Location Longitude: {weather.longitude:.2f}°")
-                print(f"Event Date: {weather.month}-{weather.day}-{weather.year}")
-                print(f"5-Year Average Temperature: {weather.avg_temp:.2f}°F")
-                print(f"5-Year Minimum Temperature: {weather.min_temp:.2f}°F")
-                print(f"5-Year Maximum Temperature: {weather.max_temp:.2f}°F")
-                print(f"5-Year Average Wind Speed: {weather.avg_wind:.2f} mph")
-                print(f"5-Year Minimum Wind Speed: {weather.min_wind:.2f} mph")
-                print(f"5-Year Maximum Wind Speed: {weather.max_wind:.2f} mph")
-                print(f"5-Year Sum Precipitation: {weather.sum_precip:.2f} inches")
-                print(f"5-Year Minimum Precipitation: {weather.min_precip:.2f} inches")
-                print(f"5-Year Maximum Precipitation: {weather.max_precip:.2f} inches")
+                sys.stdout.write(self._format(weather))
                 return weather
             else:
                 print("No data found for the specified date.")
@@ -89,20 +326,51 @@ class DatabaseHandler:
         except Exception as e:
             print(f"Error fetching data: {str(e)}")
             return None
-        finally:
-            # Close the Session
-            session.close()
+
+    def fetch_aggregates(self, month, day, year_range):
+        """Aggregate stored analyses for one month/day over an inclusive (first, last) year range"""
+        stmt = select(*_AGGREGATES).where(
+            WeatherData.month == month,
+            WeatherData.day == day,
+            WeatherData.year.between(*year_range)
+        )
+        with ro_engine.connect() as conn:
+            return conn.execute(stmt).one()
+
+    def fetch_daily_summary(self, month, day):
+        """Fetch the precomputed summary for one month/day across all stored analyses"""
+        stmt = select(WeatherDailySummary.__table__).where(
+            WeatherDailySummary.month == month,
+            WeatherDailySummary.day == day
+        )
+        with ro_engine.connect() as conn:
+            return conn.execute(stmt).first()
 
     def get_all_records(self):
-        """Fetch all weather records from the database"""
-        session = self.Session()
+        """Fetch all weather records from the database as lightweight Row tuples"""
         try:
-            records = session.query(WeatherData).all()
-            return records
+            with ro_engine.connect() as conn:
+                return conn.execute(select(WeatherData.__table__)).fetchall()
         except Exception as e:
             print(f"Error fetching all records: {str(e)}")
             return []
-        finally:
-            session.close()
+
+    def iter_all_records(self, chunk=1000):
+        """Stream all weather records in chunks without loading the whole table"""
+        with ro_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(select(WeatherData.__table__))
+            while rows := result.fetchmany(chunk):
+                yield from rows
+
+    def get_all_records_df(self):
+        """Fetch all weather records into a pandas DataFrame in one columnar read"""
+        return pd.read_sql_table('weather_data', ro_engine, columns=_RECORD_COLUMNS)
+
+    def get_all_records_array(self):
+        """Fetch all weather records into a NumPy structured array of 4-byte floats and 2-byte ints"""
+        columns = [WeatherData.__table__.c[name] for name in _RECORD_COLUMNS]
+        with ro_engine.connect() as conn:
+            rows = conn.execute(select(*columns))
+            return np.fromiter((tuple(row) for row in rows), dtype=_RECORD_DTYPE)
 
 #C.6 Summary: Queried Table and Formatted Output